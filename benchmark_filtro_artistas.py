@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+benchmark_filtro_artistas.py (Benchmark do filtro da coleta focada)
+
+Compara o filtro ANTIGO (loop artista a artista, com o loop aninhado de
+gêneros proibidos) com o filtro atual 'filter_artists_batch' da coleta
+focada, usando páginas sintéticas no formato da API do Spotify.
+
+Nenhuma requisição é enviada. Uso:
+    python benchmark_filtro_artistas.py [--artistas 200000] [--repeticoes 5]
+"""
+
+import argparse
+import random
+import timeit
+
+from coleta_focada_rap_rnb_artistas_spotify import (
+    FILTERS_CONFIG, filter_artists_batch, get_forbidden_genre_matcher
+)
+
+GENEROS_SINTETICOS = [
+    "trap", "uk drill", "deep house", "brazilian hip hop", "rap", "cloud rap",
+    "dark r&b", "melodic rap", "afro r&b", "pop rap", "underground hip hop",
+    "afrobeats", "edm", "trap brasileiro", "neo soul", "funk carioca"
+]
+
+
+def gerar_artistas_sinteticos(total, underground=False, seed=42):
+    """
+    Gera 'total' artistas crus (como em results['artists']['items']).
+
+    Por padrão a distribuição imita uma busca curinga (a maioria fica fora
+    da faixa numérica); com 'underground=True' todos ficam dentro da faixa
+    e só o filtro de gênero decide.
+    """
+    rng = random.Random(seed)
+    max_popularity = FILTERS_CONFIG['max_popularity'] if underground else 100
+    max_followers = FILTERS_CONFIG['max_followers'] if underground else 500000
+    artistas = []
+    for i in range(total):
+        artistas.append({
+            "name": f"Artista {i}",
+            "id": f"id{i:08d}",
+            "popularity": rng.randint(1, max_popularity),
+            "followers": {"total": rng.randint(0, max_followers)},
+            "genres": rng.sample(GENEROS_SINTETICOS, rng.randint(0, 4)),
+            "external_urls": {"spotify": f"https://open.spotify.com/artist/id{i:08d}"}
+        })
+    return artistas
+
+
+def filtro_antigo(artists, country, filters):
+    """
+    Cópia do filtro de 'search_artists_by_query' antes de 'filter_artists_batch'.
+    """
+    artists_found = []
+    for artist in artists:
+        popularity = artist['popularity']
+        followers = artist['followers']['total']
+        artist_genres = artist['genres']
+
+        if not (filters['min_popularity'] <= popularity <= filters['max_popularity'] and
+                followers <= filters['max_followers']):
+            continue
+
+        is_forbidden = False
+        for genre_str in artist_genres:
+            genre_lower = genre_str.lower()
+            for forbidden in filters['forbidden_genres']:
+                if forbidden in genre_lower:
+                    is_forbidden = True
+                    break
+            if is_forbidden:
+                break
+
+        if is_forbidden:
+            continue
+
+        artists_found.append({
+            "name": artist['name'],
+            "id": artist['id'],
+            "followers": followers,
+            "popularity": popularity,
+            "genres": ", ".join(artist_genres),
+            "url": artist['external_urls']['spotify'],
+            "country_search": country
+        })
+    return artists_found
+
+
+def medir(funcao, lotes, repeticoes):
+    """
+    Retorna o menor tempo (s) de aplicar 'funcao' a todos os lotes.
+    """
+    return min(timeit.repeat(
+        lambda: [funcao(lote, "US", FILTERS_CONFIG) for lote in lotes],
+        number=1, repeat=repeticoes))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark do filtro de artistas (antigo x atual).")
+    parser.add_argument("--artistas", type=int, default=200000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    # Aquece o cache do matcher de gêneros (como acontece numa coleta longa)
+    get_forbidden_genre_matcher(tuple(FILTERS_CONFIG['forbidden_genres']))
+
+    print(f"{args.artistas} artistas sintéticos, melhor de {args.repeticoes} repetições.")
+    for cenario, underground in (("busca curinga", False), ("underground", True)):
+        artistas = gerar_artistas_sinteticos(args.artistas, underground=underground)
+        filter_artists_batch(artistas[:1000], "US", FILTERS_CONFIG)
+
+        print(f"\nCenário: {cenario}")
+        print(f"{'lote':>8} | {'antigo (µs/artista)':>20} | {'atual (µs/artista)':>21} | {'ganho':>6}")
+        for tamanho_lote in (50, 1000, args.artistas):
+            lotes = [artistas[i:i + tamanho_lote]
+                     for i in range(0, len(artistas), tamanho_lote)]
+
+            # Os dois filtros precisam aprovar exatamente os mesmos artistas
+            assert [filtro_antigo(l, "US", FILTERS_CONFIG) for l in lotes] == \
+                [filter_artists_batch(l, "US", FILTERS_CONFIG) for l in lotes]
+
+            antigo = medir(filtro_antigo, lotes, args.repeticoes) / args.artistas * 1e6
+            novo = medir(filter_artists_batch, lotes, args.repeticoes) / args.artistas * 1e6
+            print(f"{tamanho_lote:>8} | {antigo:>20.3f} | {novo:>21.3f} | {antigo / novo:>5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
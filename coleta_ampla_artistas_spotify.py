@@ -1,9 +1,18 @@
+import argparse
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
 import pandas as pd
 import time
 import random
 import string  # <--- NOVO IMPORT (para a busca por letras 'a', 'b', 'c'...)
+from exportacao_delta import (
+    new_change_set, diff_records, apply_changes, write_change_set,
+    recover_orphan_journals
+)
+from planejamento_coleta import (
+    load_page_history, record_page_count, save_page_history,
+    build_spotify_plan, print_plan_summary, add_budget_arguments, apply_budget
+)
 
 # ------------------------
 # CONFIGURAÇÃO INICIAL
@@ -17,19 +26,30 @@ sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
     client_secret=CLIENT_SECRET
 ))
 
+# Intervalo (segundos) de espera entre buscas para evitar Rate Limiting (Erro 429)
+DELAY_ENTRE_BUSCAS = (1.0, 3.0)
+
+# Campos acompanhados no delta (ver 'exportacao_delta.py')
+ARTIST_TRACKED_FIELDS = ["followers", "popularity"]
+
 # ------------------------
 # FUNÇÃO PRINCIPAL DE BUSCA (--- ALTERAÇÃO ---)
 # ------------------------
 
 
-def search_artists_by_query(query, country, min_followers=0, max_followers=2000, max_popularity=25):
+def search_artists_by_query(query, country, min_followers=0, max_followers=2000, max_popularity=25,
+                            page_history=None, rejected_ids=None):
     """
     Busca artistas no Spotify usando um 'query', 'country' (market),
     e aplica filtros de seguidores e popularidade.
 
     Esta função agora implementa PAGINAÇÃO para buscar todos os resultados.
+    Se 'page_history' for passado, registra quantas páginas a busca retornou;
+    'rejected_ids' recebe os IDs dos artistas reprovados nos filtros.
     """
     artists_found = []
+    pages = 0
+    pagination_complete = False
 
     try:
         # 1. Faz a primeira busca (primeira página)
@@ -38,6 +58,7 @@ def search_artists_by_query(query, country, min_followers=0, max_followers=2000,
 
         # 2. Inicia o loop de paginação
         while results:
+            pages += 1
             # 3. Itera pelos artistas da PÁGINA ATUAL
             for artist in results['artists']['items']:
                 followers = artist['followers']['total']
@@ -54,6 +75,9 @@ def search_artists_by_query(query, country, min_followers=0, max_followers=2000,
                         "url": artist['external_urls']['spotify'],
                         "country_search": country  # País onde a busca foi feita
                     })
+                elif rejected_ids is not None:
+                    # Fora da faixa: pode ter saído do filtro desde a última coleta
+                    rejected_ids.append(artist['id'])
 
             # 5. Lógica de Paginação:
             #    Verifica se o Spotify retornou um link para a 'próxima' página
@@ -67,7 +91,8 @@ def search_artists_by_query(query, country, min_followers=0, max_followers=2000,
                         f"  -> Erro ao buscar próxima página para '{query}': {e}. Parando esta busca.")
                     results = None  # Força a saída do loop 'while'
             else:
-                # Se não há 'next', saímos do loop
+                # Se não há 'next', saímos do loop (paginação completa)
+                pagination_complete = True
                 results = None
 
     except Exception as e:
@@ -75,6 +100,11 @@ def search_artists_by_query(query, country, min_followers=0, max_followers=2000,
         print(f"  ❌ Erro na busca inicial por '{query}' em {country}: {e}")
         return []  # Retorna lista vazia para este termo
 
+    # 6. Registra a contagem de páginas para o planejador de coleta
+    #    (só se a paginação terminou normalmente; parcial subestimaria)
+    if page_history is not None and pagination_complete:
+        record_page_count(page_history, query, country, pages)
+
     return artists_found
 
 # ------------------------
@@ -137,33 +167,63 @@ def generate_search_terms():
     return list(set(search_terms))
 
 # ------------------------
-# SALVAR DADOS EM CSV (--- SEM ALTERAÇÃO ---)
+# SALVAR DADOS EM CSV (--- ALTERAÇÃO ---)
 # ------------------------
 
 
-def save_artist_data(artists, filename="artists_database.csv"):
+def save_artist_data(artists, filename="artists_database.csv", change_set=None, removed_ids=()):
     """
     Salva uma lista de artistas em um CSV, evitando duplicatas de ID.
+
+    Também remove os IDs que saíram da faixa do filtro ('removed_ids') e,
+    se 'change_set' for passado, registra as mudanças no delta da execução.
     """
     df = pd.DataFrame(artists)
-    if df.empty:
-        return  # Não faz nada se a lista de artistas estiver vazia
+    removed_ids = list(removed_ids)
+    if df.empty and not removed_ids:
+        return  # Não faz nada se não há artistas novos nem remoções
 
     try:
         # Tenta ler o arquivo CSV existente
         existing_df = pd.read_csv(filename)
-        # Concatena o novo DataFrame com o existente
-        combined_df = pd.concat([existing_df, df])
     except FileNotFoundError:
+        existing_df = None
+
+    if existing_df is None:
+        if df.empty:
+            return  # Nada a remover de um arquivo que ainda não existe
         # Se o arquivo não existe, o novo DataFrame é o DataFrame combinado
+        existing = {}
         combined_df = df
-
-    # Remove duplicatas com base no 'id' do artista, mantendo a primeira ocorrência
-    combined_df = combined_df.drop_duplicates(subset=["id"], keep='first')
+    else:
+        # Só importam os removidos que de fato estão no CSV
+        removed_mask = existing_df["id"].isin(removed_ids)
+        if df.empty and not removed_mask.any():
+            return  # Nenhuma linha armazenada mudou: não reescreve o CSV
+        removed_ids = existing_df.loc[removed_mask, "id"].tolist()
+
+        # Estado atual (antes da mescla) para calcular o delta
+        existing = existing_df.set_index(
+            "id")[ARTIST_TRACKED_FIELDS].to_dict("index")
+        # Tira quem saiu da faixa e concatena o novo DataFrame com o existente
+        combined_df = pd.concat([existing_df[~removed_mask], df])
+
+    events = []
+    if change_set is not None:
+        events = diff_records(change_set, existing, artists,
+                              ARTIST_TRACKED_FIELDS, removed_keys=removed_ids)
+
+    # Remove duplicatas com base no 'id' do artista, mantendo a ocorrência
+    # mais recente (seguidores/popularidade atualizados)
+    combined_df = combined_df.drop_duplicates(subset=["id"], keep='last')
 
     # Salva o DataFrame limpo de volta no CSV
     combined_df.to_csv(filename, index=False)
 
+    # Só entra no delta (e no journal) o que de fato foi gravado no CSV
+    if change_set is not None:
+        apply_changes(change_set, events)
+
 # ------------------------
 # LOOP PRINCIPAL (--- ALTERAÇÃO ---)
 # ------------------------
@@ -176,42 +236,79 @@ def main():
     2. Embaralha os termos.
     3. Itera por cada termo, busca os artistas e SALVA imediatamente.
     4. Lida com erros por busca, sem travar o script inteiro.
+
+    Com '--dry-run' só imprime o plano estimado; '--max-chamadas' e
+    '--max-minutos' cortam o plano antes de qualquer requisição.
     """
+    parser = argparse.ArgumentParser(
+        description="Coleta ampla de artistas no Spotify.")
+    args = add_budget_arguments(parser).parse_args()
 
     terms = generate_search_terms()
-    total_terms = len(terms)
-    print(
-        f"✅ Configuração pronta. Total de {total_terms} buscas únicas a realizar.")
 
     # Embaralhar a lista é bom para não fazer muitas buscas seguidas
     # no mesmo 'market' (país), distribuindo a carga.
     random.shuffle(terms)
 
-    # 'enumerate' nos dá um contador 'i'
-    for i, (term, country) in enumerate(terms):
+    # Planeja a coleta usando o histórico de páginas de execuções anteriores
+    page_history = load_page_history()
+    plan = apply_budget(build_spotify_plan(
+        terms, page_history, DELAY_ENTRE_BUSCAS), args)
+    print_plan_summary(plan)
+    if args.dry_run:
+        print("Dry-run: nenhuma requisição foi enviada.")
+        return
+
+    terms = [(item['term'], item['country']) for item in plan]
+    total_terms = len(terms)
+    print(
+        f"✅ Configuração pronta. Total de {total_terms} buscas únicas a realizar.")
 
-        # Imprime o progresso
-        print(f"\n🔍 Buscando ({i+1}/{total_terms}): '{term}' em {country}...")
+    # Delta desta execução (inseridos, atualizados e removidos)
+    # Publica deltas de execuções anteriores que morreram antes de publicar
+    recover_orphan_journals()
+    change_set = new_change_set("spotify_ampla", key="id")
 
-        try:
-            # Chama a função de busca (que agora é paginada)
-            artists = search_artists_by_query(term, country)
+    try:
+        # 'enumerate' nos dá um contador 'i'
+        for i, (term, country) in enumerate(terms):
 
-            if artists:
-                print(
-                    f"  -> Encontrou {len(artists)} novos artistas. Salvando no CSV...")
-                # Salva os resultados desta busca IMEDIATAMENTE
-                save_artist_data(artists)
-            else:
-                print("  -> Nenhum artista encontrado com esses filtros.")
+            # Imprime o progresso
+            print(
+                f"\n🔍 Buscando ({i+1}/{total_terms}): '{term}' em {country}...")
+
+            try:
+                # Chama a função de busca (que agora é paginada)
+                rejected_ids = []
+                artists = search_artists_by_query(
+                    term, country, page_history=page_history, rejected_ids=rejected_ids)
+
+                if artists:
+                    print(
+                        f"  -> Encontrou {len(artists)} novos artistas. Salvando no CSV...")
+                else:
+                    print("  -> Nenhum artista encontrado com esses filtros.")
 
-        except Exception as e:
-            # Captura erros inesperados durante a busca ou salvamento
-            print(f"  ❌ ERRO GRAVE na busca por '{term}' em {country}: {e}")
-            print("  Continuando para o próximo termo...")
+                # Salva os resultados desta busca IMEDIATAMENTE
+                # (e remove quem saiu da faixa do filtro)
+                save_artist_data(artists, change_set=change_set,
+                                 removed_ids=rejected_ids)
 
-        # O 'sleep' é CRUCIAL para evitar Rate Limiting (Erro 429) da API
-        time.sleep(random.uniform(1.0, 3.0))  # Um delay entre 1 e 3 segundos
+            except Exception as e:
+                # Captura erros inesperados durante a busca ou salvamento
+                print(
+                    f"  ❌ ERRO GRAVE na busca por '{term}' em {country}: {e}")
+                print("  Continuando para o próximo termo...")
+
+            # Atualiza o histórico de páginas a cada termo (como o CSV)
+            save_page_history(page_history)
+
+            # O 'sleep' é CRUCIAL para evitar Rate Limiting (Erro 429) da API
+            time.sleep(random.uniform(*DELAY_ENTRE_BUSCAS))  # Um delay entre 1 e 3 segundos
+    finally:
+        # Publica o delta mesmo se a coleta for interrompida no meio; se nem
+        # isso rodar (SIGKILL, queda), o journal é publicado na próxima execução
+        write_change_set(change_set)
 
     print("\n\n✅ Processo de coleta concluído! O arquivo 'artists_database.csv' está atualizado.")
 
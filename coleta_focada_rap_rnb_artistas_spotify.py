@@ -1,9 +1,20 @@
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
+import argparse
 import pandas as pd
+import re
 import time
 import random
 import string
+from functools import lru_cache
+from exportacao_delta import (
+    new_change_set, diff_records, apply_changes, write_change_set,
+    recover_orphan_journals
+)
+from planejamento_coleta import (
+    load_page_history, record_page_count, save_page_history,
+    build_spotify_plan, print_plan_summary, add_budget_arguments, apply_budget
+)
 
 # ------------------------
 # CONFIGURAÇÃO INICIAL
@@ -35,57 +46,113 @@ FILTERS_CONFIG = {
     ]
 }
 
+# Intervalo (segundos) de espera entre buscas para evitar Rate Limiting (Erro 429)
+DELAY_ENTRE_BUSCAS = (1.0, 3.0)
+
+# Campos acompanhados no delta (ver 'exportacao_delta.py')
+ARTIST_TRACKED_FIELDS = ["followers", "popularity"]
+
+# ------------------------
+# FILTRO DE ARTISTAS (--- NOVO ---)
+# ------------------------
+
+
+@lru_cache(maxsize=None)
+def get_forbidden_genre_matcher(forbidden_genres):
+    """
+    Compila UMA única regex com todos os gêneros proibidos e devolve uma
+    função 'is_forbidden(genre_str)' com cache por string de gênero.
+
+    'forbidden_genres' deve ser uma tupla (hashable) para que o matcher
+    seja reaproveitado entre páginas, termos e execuções no mesmo processo.
+    """
+    if not forbidden_genres:
+        # Uma regex vazia casaria com qualquer gênero: sem lista, nada é proibido
+        return lambda genre_str: False
+
+    # Mantém a semântica de substring parcial ('house' bloqueia 'deep house')
+    pattern = re.compile("|".join(
+        re.escape(genre.lower())
+        for genre in sorted(set(forbidden_genres), key=len, reverse=True)
+    ))
+
+    @lru_cache(maxsize=None)
+    def is_forbidden(genre_str):
+        return pattern.search(genre_str.lower()) is not None
+
+    return is_forbidden
+
+
+def filter_artists_batch(artists, country, filters, rejected_ids=None):
+    """
+    Aplica os filtros de popularidade, seguidores e gênero proibido à lista
+    de artistas crus da API (uma ou mais páginas de 'results['artists']['items']').
+
+    É o mesmo loop artista a artista de antes (não é vetorizado): a diferença
+    é que limites e matcher de gêneros são lidos uma vez por chamada e o
+    matcher é uma regex pré-compilada com cache por gênero. O ganho medido em
+    'benchmark_filtro_artistas.py' é modesto (~1.1-1.6x), não uma ordem de
+    grandeza.
+    Se 'rejected_ids' for passado, recebe os IDs dos artistas reprovados.
+    """
+    min_popularity = filters['min_popularity']
+    max_popularity = filters['max_popularity']
+    max_followers = filters['max_followers']
+    is_forbidden = get_forbidden_genre_matcher(
+        tuple(filters['forbidden_genres']))
+
+    artists_found = []
+    for artist in artists:
+        popularity = artist['popularity']
+        followers = artist['followers']['total']
+        artist_genres = artist['genres']  # Esta é uma lista de strings
+
+        # 1. Filtros numéricos (pop e followers)
+        # 2. Filtro de EXCLUSÃO de gênero com o matcher pré-compilado
+        if (not (min_popularity <= popularity <= max_popularity and followers <= max_followers)
+                or any(map(is_forbidden, artist_genres))):
+            if rejected_ids is not None:
+                rejected_ids.append(artist['id'])
+            continue
+
+        # 3. Se passou em AMBOS os filtros, adicione à lista
+        artists_found.append({
+            "name": artist['name'],
+            "id": artist['id'],
+            "followers": followers,
+            "popularity": popularity,
+            "genres": ", ".join(artist_genres),
+            "url": artist['external_urls']['spotify'],
+            "country_search": country
+        })
+
+    return artists_found
+
 # ------------------------
 # FUNÇÃO PRINCIPAL DE BUSCA (--- ALTERAÇÃO ---)
 # ------------------------
 
 
-def search_artists_by_query(query, country, filters):
+def search_artists_by_query(query, country, filters, page_history=None, rejected_ids=None):
     """
     Busca artistas no Spotify usando 'query', 'country' (market),
     e aplica filtros RÍGIDOS de popularidade, seguidores E exclusão de gênero.
+
+    As páginas são acumuladas cruas e filtradas de uma vez no final
+    (ver 'filter_artists_batch'). Se 'page_history' for passado, registra
+    quantas páginas a busca retornou (usado pelo planejador de coleta);
+    'rejected_ids' recebe os IDs reprovados nos filtros (usado no delta).
     """
-    artists_found = []
+    raw_artists = []
+    pages = 0
+    pagination_complete = False
 
     try:
         results = sp.search(q=query, type='artist', limit=50, market=country)
 
         while results:
-            for artist in results['artists']['items']:
-                popularity = artist['popularity']
-                followers = artist['followers']['total']
-                artist_genres = artist['genres']  # Esta é uma lista de strings
-
-                # 1. Aplicar filtros numéricos (pop e followers)
-                if not (filters['min_popularity'] <= popularity <= filters['max_popularity'] and
-                        followers <= filters['max_followers']):
-                    continue  # Pula este artista (não bate com os números)
-
-                # 2. Aplicar filtro de EXCLUSÃO de gênero (--- NOVO ---)
-                is_forbidden = False
-                for genre_str in artist_genres:
-                    # Usamos .lower() para garantir a correspondência
-                    genre_lower = genre_str.lower()
-                    for forbidden in filters['forbidden_genres']:
-                        if forbidden in genre_lower:
-                            is_forbidden = True
-                            break  # Encontrou um gênero proibido, para de verificar
-                    if is_forbidden:
-                        break  # Pula para fora do loop de gêneros
-
-                if is_forbidden:
-                    continue  # Pula este artista (contém gênero proibido)
-
-                # 3. Se passou em AMBOS os filtros, adicione à lista
-                artists_found.append({
-                    "name": artist['name'],
-                    "id": artist['id'],
-                    "followers": followers,
-                    "popularity": popularity,
-                    "genres": ", ".join(artist_genres),
-                    "url": artist['external_urls']['spotify'],
-                    "country_search": country
-                })
+            pages += 1
+            raw_artists.extend(results['artists']['items'])
 
             # Lógica de Paginação
             if results['artists']['next']:
@@ -96,13 +163,18 @@ def search_artists_by_query(query, country, filters):
                         f"  -> Erro ao buscar próxima página para '{query}': {e}. Parando esta busca.")
                     results = None
             else:
+                pagination_complete = True
                 results = None
 
     except Exception as e:
         print(f"  ❌ Erro na busca inicial por '{query}' em {country}: {e}")
         return []
 
-    return artists_found
+    # Contagem parcial (erro no 'next') subestimaria o histórico
+    if page_history is not None and pagination_complete:
+        record_page_count(page_history, query, country, pages)
+
+    return filter_artists_batch(raw_artists, country, filters, rejected_ids=rejected_ids)
 
 # ------------------------
 # GERADOR DE TERMOS DE BUSCA (--- ALTERAÇÃO ---)
@@ -171,24 +243,54 @@ def generate_search_terms():
     return list(set(search_terms))
 
 # ------------------------
-# SALVAR DADOS EM CSV (Sem alteração na lógica)
+# SALVAR DADOS EM CSV (--- ALTERAÇÃO ---)
 # ------------------------
 
 
-def save_artist_data(artists, filename="artists_database.csv"):
+def save_artist_data(artists, filename="artists_database.csv", change_set=None, removed_ids=()):
+    """
+    Mescla os artistas no CSV (o valor mais recente de cada ID prevalece),
+    remove os IDs que saíram da faixa do filtro e, se 'change_set' for
+    passado, registra inserções, atualizações e remoções no delta.
+    """
     df = pd.DataFrame(artists)
-    if df.empty:
+    removed_ids = list(removed_ids)
+    if df.empty and not removed_ids:
         return
 
     try:
         existing_df = pd.read_csv(filename)
-        combined_df = pd.concat([existing_df, df])
     except FileNotFoundError:
-        combined_df = df
+        existing_df = None
 
-    combined_df = combined_df.drop_duplicates(subset=["id"], keep='first')
+    if existing_df is None:
+        if df.empty:
+            return
+        existing = {}
+        combined_df = df
+    else:
+        # Só importam os removidos que de fato estão no CSV
+        removed_mask = existing_df["id"].isin(removed_ids)
+        if df.empty and not removed_mask.any():
+            return  # Nenhuma linha armazenada mudou: não reescreve o CSV
+        removed_ids = existing_df.loc[removed_mask, "id"].tolist()
+
+        existing = existing_df.set_index(
+            "id")[ARTIST_TRACKED_FIELDS].to_dict("index")
+        combined_df = pd.concat([existing_df[~removed_mask], df])
+
+    events = []
+    if change_set is not None:
+        events = diff_records(change_set, existing, artists,
+                              ARTIST_TRACKED_FIELDS, removed_keys=removed_ids)
+
+    combined_df = combined_df.drop_duplicates(subset=["id"], keep='last')
     combined_df.to_csv(filename, index=False)
 
+    # Só entra no delta (e no journal) o que de fato foi gravado no CSV
+    if change_set is not None:
+        apply_changes(change_set, events)
+
 # ------------------------
 # LOOP PRINCIPAL (--- ALTERAÇÃO ---)
 # ------------------------
@@ -196,6 +298,10 @@ def save_artist_data(artists, filename="artists_database.csv"):
 
 def main():
 
+    parser = argparse.ArgumentParser(
+        description="Coleta focada de artistas (Rap/R&B/Soul) no Spotify.")
+    args = add_budget_arguments(parser).parse_args()
+
     # --- NOVO ---
     # Define o nome do arquivo para esta coleta específica
     OUTPUT_FILENAME = "artists_database_rap_rnb.csv"
@@ -207,33 +313,61 @@ def main():
     print(f"Gêneros proibidos: {FILTERS_CONFIG['forbidden_genres']}")
 
     terms = generate_search_terms()
+    random.shuffle(terms)
+
+    # Planeja a coleta (e corta para o orçamento) ANTES de qualquer requisição
+    page_history = load_page_history()
+    plan = apply_budget(build_spotify_plan(
+        terms, page_history, DELAY_ENTRE_BUSCAS), args)
+    print_plan_summary(plan)
+    if args.dry_run:
+        print("Dry-run: nenhuma requisição foi enviada.")
+        return
+
+    terms = [(item['term'], item['country']) for item in plan]
     total_terms = len(terms)
     print(f"Total de {total_terms} buscas únicas a realizar.")
 
-    random.shuffle(terms)
+    # Delta desta execução para os consumidores incrementais
+    recover_orphan_journals()
+    change_set = new_change_set("spotify_rap_rnb", key="id")
 
-    for i, (term, country) in enumerate(terms):
+    try:
+        for i, (term, country) in enumerate(terms):
+
+            print(
+                f"\n🔍 Buscando ({i+1}/{total_terms}): '{term}' em {country}...")
 
-        print(f"\n🔍 Buscando ({i+1}/{total_terms}): '{term}' em {country}...")
+            try:
+                # Passa os filtros para a função de busca
+                rejected_ids = []
+                artists = search_artists_by_query(
+                    term, country, FILTERS_CONFIG,
+                    page_history=page_history, rejected_ids=rejected_ids)
 
-        try:
-            # Passa os filtros para a função de busca
-            artists = search_artists_by_query(term, country, FILTERS_CONFIG)
+                if artists:
+                    print(
+                        f"  -> Encontrou {len(artists)} novos artistas. Salvando no CSV...")
+                else:
+                    print("  -> Nenhum artista encontrado com esses filtros.")
 
-            if artists:
+                # Salva no arquivo específico (também remove quem saiu da faixa)
+                save_artist_data(artists, filename=OUTPUT_FILENAME,
+                                 change_set=change_set, removed_ids=rejected_ids)
+
+            except Exception as e:
                 print(
-                    f"  -> Encontrou {len(artists)} novos artistas. Salvando no CSV...")
-                # Salva no arquivo específico
-                save_artist_data(artists, filename=OUTPUT_FILENAME)
-            else:
-                print("  -> Nenhum artista encontrado com esses filtros.")
+                    f"  ❌ ERRO GRAVE na busca por '{term}' em {country}: {e}")
+                print("  Continuando para o próximo termo...")
 
-        except Exception as e:
-            print(f"  ❌ ERRO GRAVE na busca por '{term}' em {country}: {e}")
-            print("  Continuando para o próximo termo...")
+            save_page_history(page_history)
 
-        # Delay para evitar Rate Limiting (Erro 429) da API
-        time.sleep(random.uniform(1.0, 3.0))
+            # Delay para evitar Rate Limiting (Erro 429) da API
+            time.sleep(random.uniform(*DELAY_ENTRE_BUSCAS))
+    finally:
+        # Publica o delta mesmo se a coleta for interrompida no meio; se nem
+        # isso rodar (SIGKILL, queda), o journal é publicado na próxima execução
+        write_change_set(change_set)
 
     print(
         f"\n\n✅ Processo de coleta focado concluído! O arquivo '{OUTPUT_FILENAME}' está atualizado.")
@@ -19,6 +19,7 @@ O fluxo de trabalho é:
 
 import os
 import re
+import argparse
 import json
 import time
 from googleapiclient.discovery import build
@@ -26,6 +27,18 @@ from googleapiclient.errors import HttpError
 from dotenv import load_dotenv
 from collections import defaultdict
 import traceback
+from exportacao_delta import (
+    new_change_set, diff_records, apply_changes, write_change_set,
+    discard_change_set, recover_orphan_journals
+)
+from vinculo_produtor_artista import (
+    construir_indice_artistas, carregar_tabela_vinculos,
+    atualizar_tabela_vinculos, salvar_tabela_vinculos, carregar_confirmacoes
+)
+from planejamento_coleta import (
+    YOUTUBE_DAILY_QUOTA, build_youtube_plan, print_plan_summary,
+    add_budget_arguments, apply_budget
+)
 
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
@@ -34,13 +47,16 @@ load_dotenv()
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
 # --- CONFIGURAÇÃO DA BUSCA ---
-TERMOS_BUSCA = [
+TERMOS_GENEROS = [
     # Gêneros Principais
     "trap type beat", "trapsoul type beat", "r&b type beat",
     "uk drill type beat", "drill type beat", "ny drill type beat",
     "lofi type beat", "dark trap type beat", "neo soul type beat",
-    "chill drill type beat", "jazz type beat",
+    "chill drill type beat", "jazz type beat"
+]
 
+# Termos cujo alvo é um ARTISTA (usados na ligação produtor -> artista)
+TERMOS_ARTISTAS = [
     # Artistas (Trap / Drill)
     "drake type beat", "travis scott type beat", "future type beat",
     "gunna type beat", "lil baby type beat", "don toliver type beat",
@@ -55,28 +71,73 @@ TERMOS_BUSCA = [
     "giveon type beat"
 ]
 
+# Artistas primeiro: alimentam o ranking E a ligação produtor -> artista, então
+# são os últimos a cair quando o plano é cortado por orçamento ('--max-cota')
+TERMOS_BUSCA = TERMOS_ARTISTAS + TERMOS_GENEROS
+
 MAX_VIDEOS_POR_TERMO = 25
 ARQUIVO_SAIDA_JSON = "produtores_youtube_filtrados.json"
 CACHE_FILE = "youtube_cache.json"
 CACHE_EXPIRATION_SECONDS = 86400  # 24 horas
+PAUSA_ENTRE_BUSCAS = 0.5  # Segundos entre chamadas de 'search.list'
+CAMPOS_DELTA_PRODUTOR = ["score_popularidade_views"]
+
+PRODUCER_REGEX = re.compile(
+    r"(?:prod\.\s*by|prod\.)\s*[:\-]?\s*([^\n\r(]+)|"
+    r"beatstars\.com/([a-zA-Z0-9_-]+)",
+    re.IGNORECASE
+)
+
+
+def carregar_cache(termos_busca):
+    """
+    Carrega o cache de vídeos se ele ainda não expirou E cobre todos os
+    'termos_busca' pedidos. Retorna (videos, termos_cobertos) ou None.
+
+    O cache guarda os termos que a coleta realmente cobriu: um cache gerado
+    por uma execução cortada (orçamento ou cota) não serve para um plano maior.
+    """
+    if not os.path.exists(CACHE_FILE):
+        return None
+    file_mod_time = os.path.getmtime(CACHE_FILE)
+    if (time.time() - file_mod_time) >= CACHE_EXPIRATION_SECONDS:
+        return None
+
+    try:
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (IOError, ValueError) as e:
+        print(f"Erro ao ler o arquivo de cache: {e}")
+        return None
+
+    if not isinstance(cache, dict):
+        return None  # Formato antigo (lista de vídeos, sem termos cobertos)
+    termos_cobertos = cache.get("termos_cobertos", [])
+    if not set(termos_busca) <= set(termos_cobertos):
+        return None
+    return cache.get("videos", []), termos_cobertos
 
 
 def buscar_videos_youtube(youtube_client, termos_busca):
     """
-    Busca vídeos no YouTube com CACHE e retorna os OBJETOS de vídeo.
+    Busca vídeos no YouTube com CACHE e retorna (OBJETOS de vídeo, termos cobertos).
+
+    Um termo só conta como coberto se a busca dele funcionou e todos os
+    seus vídeos tiveram os detalhes coletados.
     """
     # Tenta carregar do cache primeiro
-    if os.path.exists(CACHE_FILE):
-        file_mod_time = os.path.getmtime(CACHE_FILE)
-        if (time.time() - file_mod_time) < CACHE_EXPIRATION_SECONDS:
-            print(f"Carregando resultados do cache ('{CACHE_FILE}')...")
-            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
+    cache = carregar_cache(termos_busca)
+    if cache is not None:
+        print(f"Carregando resultados do cache ('{CACHE_FILE}')...")
+        return cache
 
     print(
         f"Iniciando busca no YouTube por {len(termos_busca)} termos (sem cache válido)...")
     video_items_completos = []
     video_ids = set()
+    termos_por_video = defaultdict(set)  # Guarda de qual busca veio cada vídeo
+    termos_buscados = []
+    ids_sem_detalhes = set()
     quota_exceeded = False
 
     for termo in termos_busca:
@@ -95,7 +156,10 @@ def buscar_videos_youtube(youtube_client, termos_busca):
             ids_encontrados = {item['id']['videoId']
                                for item in search_response.get("items", [])}
             video_ids.update(ids_encontrados)
-            time.sleep(0.5)
+            for video_id in ids_encontrados:
+                termos_por_video[video_id].add(termo)
+            termos_buscados.append(termo)
+            time.sleep(PAUSA_ENTRE_BUSCAS)
 
         except HttpError as e:
             if 'quotaExceeded' in str(e):
@@ -111,21 +175,24 @@ def buscar_videos_youtube(youtube_client, termos_busca):
         f"Total de {len(video_ids_list)} IDs de vídeo únicos encontrados. Buscando detalhes...")
 
     if not video_ids_list:
-        return []
+        return [], termos_buscados
 
     # Busca os detalhes em lotes
     batch_size = 50
     for i in range(0, len(video_ids_list), batch_size):
+        batch_ids = video_ids_list[i:i+batch_size]
         if quota_exceeded and i > 0:
+            ids_sem_detalhes.update(video_ids_list[i:])
             break
         try:
-            batch_ids = video_ids_list[i:i+batch_size]
             video_request = youtube_client.videos().list(
                 part="snippet,statistics",
                 id=",".join(batch_ids)
             )
             video_response = video_request.execute()
-            video_items_completos.extend(video_response.get("items", []))
+            for item in video_response.get("items", []):
+                item['termos_busca'] = sorted(termos_por_video[item['id']])
+                video_items_completos.append(item)
 
         except HttpError as e:
             if 'quotaExceeded' in str(e):
@@ -134,20 +201,40 @@ def buscar_videos_youtube(youtube_client, termos_busca):
                 quota_exceeded = True
             else:
                 print(f"Erro ao buscar detalhes dos vídeos: {e}")
+            ids_sem_detalhes.update(batch_ids)
             continue
 
+    termos_cobertos = [termo for termo in termos_buscados
+                       if not any(termo in termos_por_video[video_id]
+                                  for video_id in ids_sem_detalhes)]
+
     print(
-        f"Total de {len(video_items_completos)} detalhes de vídeo coletados.")
+        f"Total de {len(video_items_completos)} detalhes de vídeo coletados "
+        f"({len(termos_cobertos)}/{len(termos_busca)} termos cobertos).")
 
-    # Salva os resultados no cache
+    # Salva os resultados no cache (com os termos que ele cobre)
     try:
         with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(video_items_completos, f, indent=4, ensure_ascii=False)
+            json.dump({"termos_cobertos": termos_cobertos,
+                       "videos": video_items_completos},
+                      f, indent=4, ensure_ascii=False)
         print(f"Resultados da busca salvos em '{CACHE_FILE}'.")
     except IOError as e:
         print(f"Erro ao salvar o arquivo de cache: {e}")
 
-    return video_items_completos
+    return video_items_completos, termos_cobertos
+
+
+def extrair_nomes_produtores(desc):
+    """
+    Usa RegEx para encontrar os nomes de produtores em uma descrição de vídeo.
+    """
+    for match in PRODUCER_REGEX.finditer(desc):
+        nome_sujo = match.group(1) or match.group(2)
+        if nome_sujo:
+            nome_limpo = re.sub(r"[@\(\)\[\]\{\}]", "", nome_sujo).strip()
+            if len(nome_limpo) > 3 and "type beat" not in nome_limpo.lower():
+                yield nome_limpo
 
 
 def extrair_e_filtrar_produtores(video_items):
@@ -156,24 +243,14 @@ def extrair_e_filtrar_produtores(video_items):
     Retorna uma lista de dicionários com nome e score de views.
     """
     print("Extraindo nomes de produtores e calculando popularidade...")
-    producer_regex = re.compile(
-        r"(?:prod\.\s*by|prod\.)\s*[:\-]?\s*([^\n\r(]+)|"
-        r"beatstars\.com/([a-zA-Z0-9_-]+)",
-        re.IGNORECASE
-    )
     produtor_view_counts = defaultdict(int)
 
     for item in video_items:
         desc = item['snippet']['description']
         view_count = int(item['statistics'].get('viewCount', 0))
 
-        matches = producer_regex.finditer(desc)
-        for match in matches:
-            nome_sujo = match.group(1) or match.group(2)
-            if nome_sujo:
-                nome_limpo = re.sub(r"[@\(\)\[\]\{\}]", "", nome_sujo).strip()
-                if len(nome_limpo) > 3 and "type beat" not in nome_limpo.lower():
-                    produtor_view_counts[nome_limpo] += view_count
+        for nome_limpo in extrair_nomes_produtores(desc):
+            produtor_view_counts[nome_limpo] += view_count
 
     if not produtor_view_counts:
         print("Nenhum produtor encontrado com os critérios de RegEx.")
@@ -209,25 +286,116 @@ def extrair_e_filtrar_produtores(video_items):
     return produtores_filtrados_json
 
 
+def produtores_observados(video_items):
+    """
+    Retorna o conjunto de todos os produtores vistos nos vídeos (antes do filtro).
+    """
+    return {nome
+            for item in video_items
+            for nome in extrair_nomes_produtores(item['snippet']['description'])}
+
+
+def alvo_do_termo(termo):
+    """
+    Extrai o artista-alvo de um termo "X type beat" (ex: "drake type beat" -> "drake").
+    """
+    return re.sub(r"\s*type beat\s*$", "", termo, flags=re.IGNORECASE).strip()
+
+
+def extrair_vinculos_produtor_artista(video_items):
+    """
+    Mantém a relação PRODUTOR -> ARTISTA-ALVO que a busca "X type beat" revela.
+    Retorna {(produtor, alvo): {video_id: views}}; só considera termos de artista.
+    """
+    termos_artistas = set(TERMOS_ARTISTAS)
+    vinculos = defaultdict(dict)
+
+    for item in video_items:
+        alvos = [alvo_do_termo(termo) for termo in item.get('termos_busca', [])
+                 if termo in termos_artistas]
+        if not alvos:
+            continue  # Vídeo de cache antigo ou só de busca por gênero
+
+        view_count = int(item['statistics'].get('viewCount', 0))
+        for produtor in extrair_nomes_produtores(item['snippet']['description']):
+            for alvo in alvos:
+                vinculos[(produtor, alvo)][item['id']] = view_count
+
+    return vinculos
+
+
+def carregar_produtores_salvos(arquivo_saida):
+    """
+    Carrega a lista de PRODUTORES da execução anterior (ou [] se não existir).
+    """
+    if not os.path.exists(arquivo_saida):
+        return []
+    try:
+        with open(arquivo_saida, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, ValueError) as e:
+        print(f"Erro ao ler arquivo anterior '{arquivo_saida}': {e}")
+        return []
+
+
+def calcular_delta_produtores(produtores_anteriores, produtores):
+    """
+    Compara a lista nova com a anterior e monta o change set da execução:
+    produtores novos, scores de views alterados e quem saiu da margem 60-80.
+    Retorna (change_set, eventos); os eventos só devem ser aplicados depois
+    que o arquivo de saída for gravado.
+    """
+    change_set = new_change_set("youtube_produtores", key="produtor")
+    existentes = {p['produtor']: p for p in produtores_anteriores}
+    atuais = {p['produtor'] for p in produtores}
+    removidos = [nome for nome in existentes if nome not in atuais]
+
+    eventos = diff_records(change_set, existentes, produtores,
+                           CAMPOS_DELTA_PRODUTOR, removed_keys=removidos)
+    return change_set, eventos
+
+
 def salvar_resultados(produtores, arquivo_saida):
     """
     Salva a lista final de PRODUTORES em um arquivo JSON.
+    Retorna True se o arquivo foi gravado.
     """
     print(f"Salvando {len(produtores)} produtores em '{arquivo_saida}'...")
     try:
         with open(arquivo_saida, 'w', encoding='utf-8') as f:
             json.dump(produtores, f, indent=4, ensure_ascii=False)
         print("Arquivo salvo com sucesso!")
+        return True
     except IOError as e:
         print(f"Erro ao salvar arquivo: {e}")
+        return False
 
 
 def main():
     """
     Função principal para orquestrar o processo.
     """
+    parser = argparse.ArgumentParser(
+        description="Coleta de produtores de 'type beat' no YouTube.")
+    args = add_budget_arguments(parser, include_quota=True).parse_args()
+
     print("Iniciando script 'coleta_produtores_youtube.py' (v1.0)...")
 
+    # Etapa 0: Planejar a coleta (e cortar para o orçamento de cota)
+    plan = apply_budget(build_youtube_plan(
+        TERMOS_BUSCA, MAX_VIDEOS_POR_TERMO, PAUSA_ENTRE_BUSCAS), args)
+    resumo = print_plan_summary(plan)
+    if resumo['quota_units'] > YOUTUBE_DAILY_QUOTA:
+        print(
+            f"ATENÇÃO: o plano excede a cota diária padrão ({YOUTUBE_DAILY_QUOTA} unidades). Use '--max-cota' para cortá-lo.")
+    termos_busca = [item['term'] for item in plan]
+    if carregar_cache(termos_busca) is not None:
+        print(
+            f"Cache válido em '{CACHE_FILE}' cobre os {len(termos_busca)} termos do plano: esta execução não deve consumir cota.")
+    if args.dry_run:
+        print("Dry-run: nenhuma requisição foi enviada.")
+        return
+
     if not YOUTUBE_API_KEY:
         print("="*50)
         print("ERRO: Por favor, configure sua chave 'YOUTUBE_API_KEY' no arquivo .env.")
@@ -245,19 +413,53 @@ def main():
         return
 
     # Etapa 1: Buscar vídeos (com stats)
-    video_items = buscar_videos_youtube(youtube_client, TERMOS_BUSCA)
+    video_items, termos_cobertos = buscar_videos_youtube(
+        youtube_client, termos_busca)
     if not video_items:
         print("Nenhum vídeo encontrado. Encerrando.")
         return
 
-    # Etapa 2: Extrair e FILTRAR produtores por popularidade
+    # Etapa 2: Ligar produtores aos artistas-alvo (tabela incremental)
+    tabela_vinculos = atualizar_tabela_vinculos(
+        carregar_tabela_vinculos(),
+        extrair_vinculos_produtor_artista(video_items),
+        construir_indice_artistas(),
+        carregar_confirmacoes())
+    salvar_tabela_vinculos(tabela_vinculos)
+
+    # Etapa 3: Extrair e FILTRAR produtores por popularidade
     produtores_filtrados = extrair_e_filtrar_produtores(video_items)
     if not produtores_filtrados:
         print("Nenhum produtor passou no filtro de popularidade. Encerrando.")
         return
 
-    # Etapa 3: Salvar resultados
-    salvar_resultados(produtores_filtrados, ARQUIVO_SAIDA_JSON)
+    # Etapa 4: Calcular o delta em relação à execução anterior
+    recover_orphan_journals()
+    produtores_anteriores = carregar_produtores_salvos(ARQUIVO_SAIDA_JSON)
+
+    if not set(TERMOS_BUSCA) <= set(termos_cobertos):
+        # Coleta parcial (orçamento/cota): a margem 60-80 foi calculada sobre
+        # parte dos produtores. Quem NÃO foi visto nesta execução continua na
+        # lista (e não vira 'removed'); só sai quem foi revisto e ficou fora.
+        observados = produtores_observados(video_items)
+        atuais = {p['produtor'] for p in produtores_filtrados}
+        mantidos = [p for p in produtores_anteriores
+                    if p['produtor'] not in observados and p['produtor'] not in atuais]
+        print(
+            f"Coleta parcial ({len(termos_cobertos)}/{len(TERMOS_BUSCA)} termos): "
+            f"mantendo {len(mantidos)} produtores anteriores não revistos.")
+        produtores_filtrados = produtores_filtrados + mantidos
+
+    change_set, eventos = calcular_delta_produtores(
+        produtores_anteriores, produtores_filtrados)
+
+    # Etapa 5: Salvar resultados (lista completa) e, só se deu certo, o delta
+    if not salvar_resultados(produtores_filtrados, ARQUIVO_SAIDA_JSON):
+        discard_change_set(change_set)
+        print("Arquivo de produtores não foi gravado: nenhum delta publicado.")
+        return
+    apply_changes(change_set, eventos)
+    write_change_set(change_set)
 
     print("Processo concluído com sucesso.")
 
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+exportacao_delta.py (Exportação incremental / "change set" por execução)
+
+Cada execução de um coletor gera um arquivo de mudanças em 'deltas/' para
+que os consumidores (ex: a etapa de ML do BeatMachAI) apliquem só o que
+mudou, sem recarregar 'artists_database*.csv' ou
+'produtores_youtube_filtrados.json' inteiros.
+
+Formato de 'deltas/<fonte>_<watermark>.json':
+    {
+        "watermark": 42,               # Contador global, sempre crescente
+        "source": "spotify_rap_rnb",
+        "key": "id",                   # Campo que identifica o registro
+        "generated_at": "2026-...Z",
+        "inserted": [registro, ...],   # Registros novos
+        "updated": [registro + {"changes": {campo: [antigo, novo]}}, ...],
+        "removed": [{key: ..., ...}, ...]  # Saíram da faixa do filtro
+    }
+
+'inserted' e 'updated' devem ser aplicados como upsert pela chave;
+'removed' como deleção. Basta o consumidor guardar o último watermark
+aplicado e processar os arquivos com watermark maior, em ordem.
+
+O watermark é atribuído no momento da PUBLICAÇÃO ('write_change_set'),
+sob um lockfile exclusivo, e não no início da execução: uma coleta longa
+do Spotify não deixa um número "reservado" para trás enquanto o coletor
+do YouTube publica o seguinte. Assim os arquivos aparecem em 'deltas/'
+sempre em ordem crescente de watermark. Pode haver lacunas na numeração
+(ex: queda entre gravar o contador e o arquivo); o consumidor deve
+apenas ignorá-las.
+
+Durabilidade: enquanto a execução roda, cada mudança já gravada no arquivo
+de dados é anexada (com fsync) a um journal 'deltas/<fonte>.<pid>.journal'.
+Se o processo morrer antes de publicar (SIGKILL, OOM, queda de energia) ou
+a publicação falhar, a próxima execução de qualquer coletor publica esse
+journal órfão com 'recover_orphan_journals'. O fluxo dos coletores é:
+'diff_records' -> grava o arquivo de dados -> 'apply_changes' (só se a
+gravação deu certo) -> 'write_change_set' no fim. Se o processo cair entre
+publicar e apagar o journal, o mesmo delta pode sair duas vezes (com
+watermarks diferentes); como é upsert/deleção por chave, reaplicar é seguro.
+"""
+
+import os
+import json
+import time
+from datetime import datetime, timezone
+
+DELTA_DIR = "deltas"
+STALE_LOCK_SECONDS = 300       # Lock sem PID legível e mais antigo que isso é abandonado
+LOCK_TIMEOUT_SECONDS = 600     # Espera máxima pelo lock (maior que STALE_LOCK_SECONDS)
+JOURNAL_SUFFIX = ".journal"
+
+
+def _to_native(value):
+    # Converte escalares do numpy/pandas (ex: int64) para tipos do Python
+    return value.item() if hasattr(value, "item") else value
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Existe, mas é de outro usuário
+    return True
+
+
+def _lock_is_stale(lock_filename):
+    """
+    Um lock é abandonado se o PID gravado nele não existe mais ou, quando o
+    PID não pôde ser lido, se o arquivo é mais antigo que STALE_LOCK_SECONDS.
+    """
+    with open(lock_filename, 'r', encoding='utf-8') as f:
+        content = f.read().strip()
+    if content.isdigit():
+        return not _pid_alive(int(content))
+    return time.time() - os.path.getmtime(lock_filename) > STALE_LOCK_SECONDS
+
+
+def _acquire_lock(lock_filename):
+    """
+    Cria o lockfile com O_EXCL (atômico) contendo o PID do processo; espera
+    enquanto outro coletor o segura e descarta locks de processos que caíram.
+    """
+    deadline = time.time() + LOCK_TIMEOUT_SECONDS
+    while True:
+        try:
+            fd = os.open(lock_filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            return
+        except FileExistsError:
+            try:
+                if _lock_is_stale(lock_filename):
+                    print(f"  -> Removendo lock abandonado '{lock_filename}'.")
+                    os.remove(lock_filename)
+                    continue
+            except FileNotFoundError:
+                continue  # Liberado entre as duas chamadas: tenta de novo
+            if time.time() > deadline:
+                raise TimeoutError(
+                    f"Não foi possível obter o lock '{lock_filename}'.")
+            time.sleep(0.1)
+
+
+def _next_watermark(filename):
+    """
+    Incrementa e grava o contador global. Deve ser chamado com o lock.
+    """
+    watermark = 0
+    if os.path.exists(filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            watermark = json.load(f).get("watermark", 0)
+
+    watermark += 1
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        json.dump({"watermark": watermark}, f)
+    os.replace(tmp_filename, filename)
+    return watermark
+
+
+def _append_journal(journal, entries):
+    with open(journal, 'a', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def new_change_set(source, key, directory=DELTA_DIR):
+    """
+    Cria um change set vazio e o journal desta execução. As mudanças ficam
+    indexadas pela chave até serem gravadas com 'write_change_set' (que
+    atribui o watermark).
+    """
+    os.makedirs(directory, exist_ok=True)
+    journal = os.path.join(directory, f"{source}.{os.getpid()}{JOURNAL_SUFFIX}")
+    if os.path.exists(journal):
+        os.remove(journal)  # Sobra de um processo antigo com o mesmo PID
+    _append_journal(journal, [{"source": source, "key": key}])
+
+    return {
+        "source": source,
+        "key": key,
+        "journal": journal,
+        "inserted": {},
+        "updated": {},
+        "removed": {}
+    }
+
+
+def record_insert(change_set, record):
+    key = record[change_set["key"]]
+    change_set["removed"].pop(key, None)
+    change_set["inserted"][key] = record
+
+
+def record_update(change_set, record, changes):
+    key = record[change_set["key"]]
+    if key in change_set["inserted"]:
+        # Inserido nesta mesma execução: o consumidor só precisa do valor final
+        change_set["inserted"][key] = record
+        return
+
+    previous = change_set["updated"].get(key)
+    if previous is not None:
+        # Mantém o valor ANTIGO da primeira alteração e o NOVO da última
+        for field, (old, new) in changes.items():
+            if field in previous["changes"]:
+                changes[field] = [previous["changes"][field][0], new]
+        changes = {**previous["changes"], **changes}
+    change_set["updated"][key] = {**record, "changes": changes}
+
+
+def record_removal(change_set, record):
+    key = record[change_set["key"]]
+    change_set["updated"].pop(key, None)
+    if change_set["inserted"].pop(key, None) is not None:
+        return  # Inserido e removido na mesma execução: nada a propagar
+    change_set["removed"][key] = record
+
+
+def _apply_event(change_set, event):
+    if event["op"] == "insert":
+        record_insert(change_set, event["record"])
+    elif event["op"] == "update":
+        record_update(change_set, event["record"], dict(event["changes"]))
+    elif event["op"] == "remove":
+        record_removal(change_set, event["record"])
+
+
+def diff_records(change_set, existing, new_records, tracked_fields, removed_keys=()):
+    """
+    Compara registros novos com os já armazenados e retorna a lista de
+    eventos (inserção, atualização, remoção). NÃO altera o change set:
+    aplique com 'apply_changes' depois que o arquivo de dados for gravado.
+
+    'existing' é um dicionário {chave: {campo: valor}} com o estado atual;
+    'removed_keys' são chaves que saíram da faixa do filtro nesta execução
+    (só geram remoção se existirem em 'existing').
+    """
+    key_field = change_set["key"]
+    events = []
+
+    for record in new_records:
+        old = existing.get(record[key_field])
+        if old is None:
+            events.append({"op": "insert", "record": record})
+            continue
+
+        changes = {}
+        for field in tracked_fields:
+            old_value = _to_native(old.get(field))
+            new_value = _to_native(record.get(field))
+            if old_value != new_value:
+                changes[field] = [old_value, new_value]
+        if changes:
+            events.append({"op": "update", "record": record, "changes": changes})
+
+    for key in removed_keys:
+        old = existing.get(key)
+        if old is not None:
+            removed = {key_field: _to_native(key)}
+            removed.update({field: _to_native(old.get(field))
+                           for field in tracked_fields})
+            events.append({"op": "remove", "record": removed})
+
+    return events
+
+
+def apply_changes(change_set, events):
+    """
+    Anexa os eventos ao journal (com fsync) e os acumula no change set.
+    Deve ser chamado logo DEPOIS de gravar o arquivo de dados com sucesso.
+    """
+    if not events:
+        return
+    _append_journal(change_set["journal"], events)
+    for event in events:
+        _apply_event(change_set, event)
+
+
+def discard_change_set(change_set):
+    """
+    Descarta o change set sem publicar (ex: a gravação do arquivo de dados falhou).
+    """
+    if os.path.exists(change_set["journal"]):
+        os.remove(change_set["journal"])
+
+
+def _load_journal(journal):
+    """
+    Reconstrói um change set a partir de um journal. Uma última linha
+    truncada (queda no meio da escrita) é ignorada.
+    """
+    with open(journal, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+
+    header = json.loads(lines[0])
+    change_set = {"source": header["source"], "key": header["key"],
+                  "journal": journal, "inserted": {}, "updated": {}, "removed": {}}
+    for line in lines[1:]:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            break
+        _apply_event(change_set, event)
+    return change_set
+
+
+def recover_orphan_journals(directory=DELTA_DIR):
+    """
+    Publica os journals de execuções que morreram antes de publicar seu delta.
+    Chamado no início de cada coleta.
+    """
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(JOURNAL_SUFFIX):
+            continue
+        pid = name[:-len(JOURNAL_SUFFIX)].rsplit(".", 1)[-1]
+        if pid.isdigit() and (int(pid) == os.getpid() or _pid_alive(int(pid))):
+            continue  # Execução ainda em andamento
+
+        journal = os.path.join(directory, name)
+        try:
+            change_set = _load_journal(journal)
+        except (IOError, ValueError, IndexError, KeyError) as e:
+            print(f"  -> Journal '{journal}' ilegível ({e}); mantendo para inspeção.")
+            continue
+        print(f"  -> Publicando delta órfão de uma execução interrompida ('{journal}').")
+        write_change_set(change_set, directory=directory)
+
+
+def write_change_set(change_set, directory=DELTA_DIR):
+    """
+    Atribui o próximo watermark e grava o change set em
+    '<directory>/<fonte>_<watermark>.json', tudo sob o lock de 'directory'.
+    Retorna o caminho do arquivo.
+    """
+    os.makedirs(directory, exist_ok=True)
+    lock_filename = os.path.join(directory, "watermark.lock")
+    payload = {
+        "source": change_set["source"],
+        "key": change_set["key"],
+        "inserted": list(change_set["inserted"].values()),
+        "updated": list(change_set["updated"].values()),
+        "removed": list(change_set["removed"].values())
+    }
+
+    _acquire_lock(lock_filename)
+    try:
+        watermark = _next_watermark(os.path.join(directory, "watermark.json"))
+        payload = {"watermark": watermark,
+                   "generated_at": datetime.now(timezone.utc).isoformat(),
+                   **payload}
+        filename = os.path.join(
+            directory, f"{change_set['source']}_{watermark:08d}.json")
+
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_filename, filename)
+    finally:
+        os.remove(lock_filename)
+
+    # Publicado: o journal desta execução já não é necessário
+    discard_change_set(change_set)
+
+    print(
+        f"📦 Delta (watermark {watermark}) salvo em '{filename}': "
+        f"{len(payload['inserted'])} inseridos, {len(payload['updated'])} atualizados, "
+        f"{len(payload['removed'])} removidos.")
+    return filename
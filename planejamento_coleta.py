@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+planejamento_coleta.py (Planejador de buscas / estimativa "dry-run")
+
+Monta o plano completo de buscas de um coletor ANTES de enviar qualquer
+requisição e estima quantas chamadas, páginas, unidades de cota e quanto
+tempo de relógio a coleta vai consumir.
+
+- Spotify: cada (termo, país) custa 1 chamada por página. Quando já
+  rodamos aquele termo antes, usamos a contagem de páginas registrada no
+  histórico; caso contrário, assumimos o máximo que a API permite paginar.
+- YouTube: cada termo custa 1 'search.list' (100 unidades) e os detalhes
+  dos vídeos saem em lotes de 50 IDs ('videos.list', 1 unidade por lote).
+
+O plano pode ser cortado para caber em um orçamento (chamadas, cota ou
+minutos) com 'trim_plan_to_budget'.
+"""
+
+import os
+import json
+import math
+
+# --- HISTÓRICO DE PÁGINAS ---
+# Compartilhado pelos coletores do Spotify: a paginação depende só de
+# (termo, país), os filtros são aplicados depois.
+PAGE_HISTORY_FILE = "historico_paginas_spotify.json"
+
+# --- LIMITES DO SPOTIFY ---
+SPOTIFY_PAGE_SIZE = 50
+SPOTIFY_MAX_OFFSET = 1000  # A busca não pagina além de offset + limit = 1000
+SPOTIFY_MAX_PAGES = SPOTIFY_MAX_OFFSET // SPOTIFY_PAGE_SIZE
+SPOTIFY_SECONDS_PER_REQUEST = 0.4  # Latência média estimada por página
+
+# --- LIMITES DO YOUTUBE ---
+YOUTUBE_SEARCH_COST = 100        # Unidades por 'search.list'
+YOUTUBE_VIDEOS_COST = 1          # Unidades por 'videos.list'
+YOUTUBE_VIDEOS_BATCH_SIZE = 50   # IDs por 'videos.list'
+YOUTUBE_DAILY_QUOTA = 10000
+YOUTUBE_SECONDS_PER_REQUEST = 0.4
+
+
+def _history_key(term, country):
+    return f"{term}|{country}"
+
+
+def load_page_history(filename=PAGE_HISTORY_FILE):
+    """
+    Carrega o histórico de páginas por (termo, país). Retorna {} se não existir.
+    """
+    if not os.path.exists(filename):
+        return {}
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, ValueError) as e:
+        print(f"  -> Erro ao ler histórico de páginas '{filename}': {e}")
+        return {}
+
+
+def record_page_count(history, term, country, pages):
+    """
+    Registra quantas páginas a busca (termo, país) retornou nesta execução.
+    """
+    history[_history_key(term, country)] = pages
+
+
+def save_page_history(history, filename=PAGE_HISTORY_FILE):
+    """
+    Salva o histórico de páginas em JSON.
+    """
+    try:
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(history, f, indent=4, ensure_ascii=False)
+    except IOError as e:
+        print(f"  -> Erro ao salvar histórico de páginas '{filename}': {e}")
+
+
+def build_spotify_plan(terms, history, delay_range):
+    """
+    Monta o plano de uma coleta do Spotify a partir da lista de (termo, país).
+
+    'delay_range' é o intervalo (min, max) de espera entre buscas usado pelo
+    coletor; a estimativa de tempo usa a média desse intervalo.
+    """
+    mean_delay = sum(delay_range) / 2
+    plan = []
+    for term, country in terms:
+        pages = history.get(_history_key(term, country))
+        from_history = pages is not None
+        if not from_history:
+            pages = SPOTIFY_MAX_PAGES
+
+        plan.append({
+            "source": "spotify",
+            "term": term,
+            "country": country,
+            "pages": pages,
+            "calls": pages,
+            "quota_units": 0,
+            "video_ids": 0,
+            "seconds": pages * SPOTIFY_SECONDS_PER_REQUEST + mean_delay,
+            "from_history": from_history
+        })
+    return plan
+
+
+def build_youtube_plan(terms, max_videos_per_term, delay):
+    """
+    Monta o plano de uma coleta do YouTube a partir da lista de termos.
+    Os lotes de 'videos.list' são contabilizados no resumo do plano.
+    """
+    return [{
+        "source": "youtube",
+        "term": term,
+        "country": None,
+        "pages": 1,
+        "calls": 1,
+        "quota_units": YOUTUBE_SEARCH_COST,
+        "video_ids": max_videos_per_term,
+        "seconds": YOUTUBE_SECONDS_PER_REQUEST + delay,
+        "from_history": False
+    } for term in terms]
+
+
+def summarize_plan(plan):
+    """
+    Soma as estimativas do plano (incluindo os lotes de detalhes do YouTube).
+    """
+    pages = sum(item["pages"] for item in plan)
+    calls = sum(item["calls"] for item in plan)
+    quota_units = sum(item["quota_units"] for item in plan)
+    seconds = sum(item["seconds"] for item in plan)
+
+    video_ids = sum(item["video_ids"] for item in plan)
+    detail_batches = math.ceil(video_ids / YOUTUBE_VIDEOS_BATCH_SIZE)
+    calls += detail_batches
+    quota_units += detail_batches * YOUTUBE_VIDEOS_COST
+    seconds += detail_batches * YOUTUBE_SECONDS_PER_REQUEST
+
+    return {
+        "terms": len(plan),
+        "terms_from_history": sum(1 for item in plan if item["from_history"]),
+        "pages": pages,
+        "calls": calls,
+        "quota_units": quota_units,
+        "seconds": seconds
+    }
+
+
+def _fits_budget(summary, max_calls, max_quota_units, max_seconds):
+    return ((max_calls is None or summary["calls"] <= max_calls) and
+            (max_quota_units is None or summary["quota_units"] <= max_quota_units) and
+            (max_seconds is None or summary["seconds"] <= max_seconds))
+
+
+def trim_plan_to_budget(plan, max_calls=None, max_quota_units=None, max_seconds=None):
+    """
+    Retorna o maior prefixo do plano que cabe no orçamento informado.
+
+    Como os custos só crescem com o tamanho do prefixo, o corte é feito
+    por busca binária sobre o número de termos mantidos.
+    """
+    low, high = 0, len(plan)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if _fits_budget(summarize_plan(plan[:mid]), max_calls, max_quota_units, max_seconds):
+            low = mid
+        else:
+            high = mid - 1
+    return plan[:low]
+
+
+def print_plan_summary(plan, title="Plano de coleta"):
+    """
+    Imprime o resumo das estimativas do plano.
+    """
+    summary = summarize_plan(plan)
+    print(f"📋 {title}:")
+    print(
+        f"  Termos: {summary['terms']} ({summary['terms_from_history']} com histórico de páginas)")
+    print(f"  Páginas estimadas: {summary['pages']}")
+    print(f"  Chamadas à API: {summary['calls']}")
+    print(f"  Unidades de cota: {summary['quota_units']}")
+    print(f"  Tempo estimado: {summary['seconds'] / 60:.1f} min")
+    return summary
+
+
+def add_budget_arguments(parser, include_quota=False):
+    """
+    Adiciona os argumentos de dry-run e orçamento a um ArgumentParser.
+    '--max-cota' só faz sentido para fontes com cota em unidades (YouTube).
+    """
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Só monta o plano e imprime as estimativas, sem chamar a API.")
+    parser.add_argument("--max-chamadas", type=int, default=None,
+                        help="Corta o plano para no máximo N chamadas à API.")
+    if include_quota:
+        parser.add_argument("--max-cota", type=int, default=None,
+                            help="Corta o plano para no máximo N unidades de cota.")
+    parser.add_argument("--max-minutos", type=float, default=None,
+                        help="Corta o plano para no máximo N minutos estimados.")
+    return parser
+
+
+def apply_budget(plan, args):
+    """
+    Aplica o orçamento vindo da linha de comando ao plano e avisa se houve corte.
+    """
+    max_seconds = args.max_minutos * 60 if args.max_minutos is not None else None
+    trimmed = trim_plan_to_budget(plan,
+                                  max_calls=args.max_chamadas,
+                                  max_quota_units=getattr(
+                                      args, "max_cota", None),
+                                  max_seconds=max_seconds)
+    if len(trimmed) < len(plan):
+        print(
+            f"✂️  Plano cortado para caber no orçamento: {len(trimmed)}/{len(plan)} termos.")
+    return trimmed
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+vinculo_produtor_artista.py (Ligação YouTube -> Spotify)
+
+Mantém uma tabela de arestas PRODUTOR -> ARTISTA-ALVO a partir das buscas
+"X type beat" do coletor do YouTube e liga cada alvo aos artistas das bases
+do Spotify ('artists_database*.csv').
+
+- A ligação usa um índice hash por nome normalizado (sem acento, minúsculo,
+  só letras/números), então cada alvo é resolvido com uma consulta ao
+  dicionário em vez de comparar contra todos os artistas.
+- A ligação é SÓ POR NOME, e as duas bases do Spotify guardam apenas
+  artistas underground (no máximo 2000 seguidores, popularidade até 15/25).
+  Alvos de "type beat" costumam ser artistas grandes ("drake", "future",
+  "lil baby"), que nunca estão nessas bases: um nome igual ali é quase
+  sempre um homônimo. Por isso o nome sozinho NUNCA liga um alvo a um id;
+  cada alvo recebe um status em 'ligacao':
+    * "confirmada": o id foi informado à mão em 'confirmacoes_alvo_spotify.json'
+      ({"<alvo normalizado>": "<spotify id>"}). Só esses entram em
+      'spotify_ids' e no índice 'por_spotify_id'.
+    * "candidata": há artistas com o mesmo nome nas bases. Ficam em
+      'candidatos_spotify' com seguidores e popularidade, para o consumidor
+      descartar homônimos óbvios; NÃO entram no índice.
+    * "sem_correspondencia": nenhum artista com esse nome nas bases.
+- A tabela é salva já agrupada por alvo, então "quais produtores atuam em
+  torno do artista X" é uma consulta direta ('produtores_do_artista').
+- A atualização é incremental: cada execução mescla os vídeos novos nas
+  arestas existentes (views por vídeo, sem contar o mesmo vídeo duas vezes).
+
+Formato de 'vinculos_produtor_artista.json':
+    {
+        "por_alvo": {
+            "<alvo normalizado>": {
+                "alvo": "drake",
+                "ligacao": "confirmada" | "candidata" | "sem_correspondencia",
+                "spotify_ids": ["..."],          # Só quando 'confirmada'
+                "candidatos_spotify": [          # Homônimos das bases do Spotify
+                    {"id": "...", "name": "Drake", "followers": 812, "popularity": 9}
+                ],
+                "produtores": {
+                    "<produtor>": {"videos": {"<video_id>": views}, "views": 123,
+                                   "atualizado_em": "2026-...Z"}
+                }
+            }
+        },
+        "por_spotify_id": {"<spotify id>": ["<alvo normalizado>", ...]}
+    }
+"""
+
+import os
+import re
+import csv
+import glob
+import json
+import unicodedata
+from datetime import datetime, timezone
+
+ARQUIVO_VINCULOS = "vinculos_produtor_artista.json"
+ARQUIVO_CONFIRMACOES = "confirmacoes_alvo_spotify.json"
+PADRAO_BASES_SPOTIFY = "artists_database*.csv"
+
+
+def normalizar_nome(nome):
+    """
+    Normaliza um nome para a chave do índice: remove acentos, caixa e
+    pontuação ("Beyoncé" -> "beyonce", "A$AP Rocky" -> "a ap rocky").
+    """
+    sem_acento = unicodedata.normalize("NFKD", nome)
+    sem_acento = "".join(c for c in sem_acento if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", sem_acento.lower()).split())
+
+
+def _inteiro(valor):
+    try:
+        return int(float(valor))
+    except (TypeError, ValueError):
+        return None
+
+
+def construir_indice_artistas(padrao=PADRAO_BASES_SPOTIFY):
+    """
+    Lê as bases de artistas do Spotify e monta o índice
+    {nome normalizado: {id: {"name", "followers", "popularity"}}}.
+    """
+    indice = {}
+    for arquivo in sorted(glob.glob(padrao)):
+        try:
+            with open(arquivo, 'r', encoding='utf-8', newline='') as f:
+                for linha in csv.DictReader(f):
+                    if linha.get('name') and linha.get('id'):
+                        indice.setdefault(normalizar_nome(linha['name']), {})[linha['id']] = {
+                            "name": linha['name'],
+                            "followers": _inteiro(linha.get('followers')),
+                            "popularity": _inteiro(linha.get('popularity'))
+                        }
+        except (IOError, csv.Error) as e:
+            print(f"Erro ao ler base do Spotify '{arquivo}': {e}")
+
+    print(
+        f"Índice de artistas do Spotify: {len(indice)} nomes normalizados.")
+    return indice
+
+
+def carregar_tabela_vinculos(arquivo=ARQUIVO_VINCULOS):
+    """
+    Carrega a tabela de arestas salva (ou uma tabela vazia).
+    """
+    if os.path.exists(arquivo):
+        try:
+            with open(arquivo, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            print(f"Erro ao ler tabela de vínculos '{arquivo}': {e}")
+    return {"por_alvo": {}, "por_spotify_id": {}}
+
+
+def carregar_confirmacoes(arquivo=ARQUIVO_CONFIRMACOES):
+    """
+    Carrega as ligações confirmadas à mão {alvo normalizado: spotify id}
+    (ou {} se o arquivo não existir).
+    """
+    if not os.path.exists(arquivo):
+        return {}
+    try:
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            return {normalizar_nome(alvo): spotify_id
+                    for alvo, spotify_id in json.load(f).items()}
+    except (IOError, ValueError, AttributeError) as e:
+        print(f"Erro ao ler confirmações '{arquivo}': {e}")
+        return {}
+
+
+def atualizar_tabela_vinculos(tabela, vinculos, indice_artistas, confirmacoes=None):
+    """
+    Mescla os vínculos desta execução na tabela.
+
+    'vinculos' é um dicionário {(produtor, alvo): {video_id: views}}.
+    Depois da mescla, todos os alvos são religados (as bases crescem a cada
+    coleta): só os alvos em 'confirmacoes' entram no índice por id; os
+    homônimos das bases ficam como candidatos (ver docstring do módulo).
+    """
+    confirmacoes = confirmacoes or {}
+    agora = datetime.now(timezone.utc).isoformat()
+    por_alvo = tabela["por_alvo"]
+
+    for (produtor, alvo), videos in vinculos.items():
+        chave = normalizar_nome(alvo)
+        entrada = por_alvo.setdefault(
+            chave, {"alvo": alvo, "ligacao": "sem_correspondencia",
+                    "spotify_ids": [], "candidatos_spotify": [], "produtores": {}})
+        aresta = entrada["produtores"].setdefault(
+            produtor, {"videos": {}, "views": 0})
+        aresta["videos"].update(videos)
+        aresta["views"] = sum(aresta["videos"].values())
+        aresta["atualizado_em"] = agora
+
+    por_spotify_id = {}
+    for chave, entrada in por_alvo.items():
+        candidatos = [{"id": spotify_id, **dados}
+                      for spotify_id, dados in indice_artistas.get(chave, {}).items()]
+        candidatos.sort(key=lambda c: (-(c["followers"] or 0), c["id"]))
+        entrada["candidatos_spotify"] = candidatos
+
+        spotify_id = confirmacoes.get(chave)
+        if spotify_id:
+            entrada["ligacao"] = "confirmada"
+            entrada["spotify_ids"] = [spotify_id]
+            por_spotify_id.setdefault(spotify_id, []).append(chave)
+        else:
+            entrada["ligacao"] = "candidata" if candidatos else "sem_correspondencia"
+            entrada["spotify_ids"] = []
+    tabela["por_spotify_id"] = por_spotify_id
+
+    total_arestas = sum(len(e["produtores"]) for e in por_alvo.values())
+    confirmados = sum(1 for e in por_alvo.values() if e["ligacao"] == "confirmada")
+    candidatos = sum(1 for e in por_alvo.values() if e["ligacao"] == "candidata")
+    print(
+        f"Vínculos: {total_arestas} arestas produtor->alvo em {len(por_alvo)} alvos "
+        f"({confirmados} confirmados no Spotify, {candidatos} só com homônimos por nome).")
+    return tabela
+
+
+def salvar_tabela_vinculos(tabela, arquivo=ARQUIVO_VINCULOS):
+    """
+    Salva a tabela de arestas em JSON.
+    """
+    try:
+        with open(arquivo, 'w', encoding='utf-8') as f:
+            json.dump(tabela, f, indent=4, ensure_ascii=False)
+        print(f"Tabela de vínculos salva em '{arquivo}'.")
+    except IOError as e:
+        print(f"Erro ao salvar tabela de vínculos: {e}")
+
+
+def produtores_do_artista(tabela, nome=None, spotify_id=None):
+    """
+    Retorna {produtor: aresta} dos produtores ativos em torno do artista,
+    consultando pelo nome (normalizado) ou pelo ID do Spotify. A consulta
+    por ID só encontra alvos com 'ligacao' == "confirmada".
+    """
+    if spotify_id is not None:
+        produtores = {}
+        for chave in tabela["por_spotify_id"].get(spotify_id, ()):
+            produtores.update(tabela["por_alvo"][chave]["produtores"])
+        return produtores
+
+    entrada = tabela["por_alvo"].get(normalizar_nome(nome or ""))
+    return entrada["produtores"] if entrada else {}